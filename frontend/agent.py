@@ -1,60 +1,139 @@
 from __future__ import annotations
 
-from openai import OpenAI
+from openai import AssistantEventHandler, DefaultHttpxClient, OpenAI
+import httpx
+import mimetypes
 import os
+import random
+import re
+import threading
 import time
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
 
 from dotenv import load_dotenv
 load_dotenv() 
 
+# Keep connections to the API alive across a conversation so each call skips the TCP+TLS handshake;
+# HTTP/2 lets the calls of one user action share a single connection
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, keepalive_expiry=300.0)
+_HTTP_TIMEOUT = 30.0
+
 # Initialize client (reads OPENAI_API_KEY from env if not provided)
-openai_client = OpenAI()
+openai_client = OpenAI(
+    timeout=_HTTP_TIMEOUT,
+    http_client=DefaultHttpxClient(limits=_HTTP_LIMITS, http2=True),
+)
 
 # Get your Assistant ID from env
 ASSISTANT_ID = os.getenv("ASSISTANT_ID")
 if not ASSISTANT_ID:
     raise ValueError("Missing ASSISTANT_ID environment variable.")
 
+# Model used to condense old conversation turns (see summarize)
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+
+# Upload limit for images sent to the assistant
+MAX_IMAGE_BYTES = 20 * 1024 * 1024  # 20MB
+
+# Yielded by the *_stream functions between separate assistant messages of one run
+MESSAGE_BREAK = object()
+
+# Run statuses that never change again
+_TERMINAL_STATUSES = ("completed", "failed", "cancelled", "expired", "incomplete")
+
+# Seeded once; used to jitter the run-polling backoff
+_rng = random.Random()
+
+# Background workers for cleanup calls that shouldn't delay the user's reply
+_cleanup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="agent-cleanup")
+
+# thread_id -> (newest message id, rendered history) from the last get_history call,
+# least recently used first; shared by every session, so trimmed to _HISTORY_CACHE_SIZE threads
+_HISTORY_CACHE_SIZE = 64
+_history_cache: OrderedDict[str, Tuple[str, List[Dict[str, str]]]] = OrderedDict()
+_history_lock = threading.Lock()
+
+# Product links appended to history messages that mention a product
+_PRODUCT_LINKS: Dict[str, str] = {
+    "EcoStatic": " - https://bioreactguatemala.com/product/ecostatic-urbano/",
+    "EcoBotanik": " - https://bioreactguatemala.com/product/ecobotanik-1l/",
+    "FungiPlus": " - https://bioreactguatemala.com/product/fungiplus-urbano/",
+    "ParaFungi": " - https://bioreactguatemala.com/product/parafungi-1l/",
+    "DiatoMaster": " - https://bioreactguatemala.com/product/tierra-de-diatomeas-diatomaster-media-libra/"
+}
+# Matches any product name in a single pass over the text
+_PRODUCT_RE = re.compile("|".join(re.escape(product) for product in _PRODUCT_LINKS))
+
 # -------- Helpers -------- #
 
+def _part_text(item) -> str:
+    """
+    Text for a single message content part ("[Image]" for images, "" for anything else).
+    """
+    # Handle different content types
+    item_type = getattr(item, "type", None)
+    if item_type == "text" and hasattr(item, "text"):
+        return getattr(item.text, "value", "") or ""
+    if item_type == "image_file":
+        # For image content, we might want to add a placeholder
+        return "[Image]"
+    return ""
+
 def _extract_text_parts(message) -> str:
     """
     Safely extract text from an OpenAI message object (handles multi-part content).
     """
-    parts: List[str] = []
     content = getattr(message, "content", []) or []
-    
-    for item in content:
-        # Handle different content types
-        if hasattr(item, 'type'):
-            if item.type == "text" and hasattr(item, 'text'):
-                text_value = getattr(item.text, 'value', '')
-                if text_value:
-                    parts.append(text_value)
-            elif item.type == "image_file":
-                # For image content, we might want to add a placeholder
-                parts.append("[Image]")
-    
-    return "\n".join(parts).strip()
 
-def _poll_run_until_done(thread_id: str, run_id: str, timeout: float = 120.0, poll_interval: float = 1.0):
+    # Fast path: most messages are a single text part
+    if len(content) == 1:
+        return _part_text(content[0]).strip()
+
+    return "\n".join(filter(None, map(_part_text, content))).strip()
+
+def _backoff_delay(
+    attempt: int,
+    poll_interval: float,
+    max_interval: float,
+    jitter: Literal["full", "equal", "none"] = "full",
+) -> float:
     """
-    Poll the run status until 'completed' or 'failed' or timeout.
+    Truncated exponential backoff delay for the given attempt number.
+    """
+    cap = min(max_interval, poll_interval * (2 ** attempt))
+    if jitter == "full":
+        return _rng.uniform(0, cap)
+    if jitter == "equal":
+        return cap / 2 + _rng.uniform(0, cap / 2)
+    return cap
+
+def _poll_run_until_done(
+    thread_id: str,
+    run_id: str,
+    timeout: float = 120.0,
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
+    until: Tuple[str, ...] = _TERMINAL_STATUSES + ("requires_action",),
+):
+    """
+    Poll the run status until it reaches one of the `until` statuses (by default a terminal state
+    or 'requires_action'), or times out.
+    Sleeps between polls use exponential backoff starting at poll_interval and capped at max_interval.
     """
     t0 = time.time()
+    n = 0
     while True:
         try:
             run = openai_client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
             status = getattr(run, "status", "")
             
-            if status in ("completed", "failed", "cancelled", "expired"):
+            # requires_action stops the default poll: nothing in this loop submits tool outputs,
+            # so waiting would only burn the timeout. Callers decide how to handle it.
+            if status in until:
                 return run
-            elif status == "requires_action":
-                # Handle function calls if needed
-                print(f"Run requires action: {status}")
-                # You might want to handle tool calls here
-                pass
             
             if (time.time() - t0) > timeout:
                 raise TimeoutError(f"Run did not complete within {timeout} seconds (status: {status}).")
@@ -64,7 +143,138 @@ def _poll_run_until_done(thread_id: str, run_id: str, timeout: float = 120.0, po
             if (time.time() - t0) > timeout:
                 raise TimeoutError(f"Run polling failed: {e}")
         
-        time.sleep(poll_interval)
+        time.sleep(_backoff_delay(n, poll_interval, max_interval, jitter))
+        n += 1
+
+class _ReplyCollector(AssistantEventHandler):
+    """
+    Stream event handler that accumulates assistant text deltas, one entry per message.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._parts: List[List[str]] = []
+
+    def on_message_created(self, message) -> None:
+        self._parts.append([])
+
+    def on_text_delta(self, delta, snapshot) -> None:
+        value = getattr(delta, "value", None)
+        if not value:
+            return
+        if not self._parts:
+            self._parts.append([])
+        self._parts[-1].append(value)
+
+    @property
+    def replies(self) -> List[str]:
+        texts = ("".join(parts).strip() for parts in self._parts)
+        return [text for text in texts if text]
+
+def _check_run_completed(run) -> None:
+    """
+    Raise a RuntimeError describing the run unless it completed.
+    """
+    if run.status != "completed":
+        # Basic error surface; you can expand with more detail if needed
+        error_msg = f"Run ended with status: {run.status}"
+        required = getattr(run, "required_action", None)
+        if required is not None and getattr(required, "submit_tool_outputs", None):
+            tools = ", ".join(call.function.name for call in required.submit_tool_outputs.tool_calls)
+            error_msg += f" - Unhandled tool calls: {tools}"
+        if hasattr(run, 'last_error') and run.last_error:
+            error_msg += f" - Error: {run.last_error}"
+        raise RuntimeError(error_msg)
+
+def _run_assistant(
+    thread_id: str,
+    assistant_id: str,
+    timeout: float = 120.0,
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
+) -> List[str]:
+    """
+    Stream a run of the assistant on the thread and return its new replies as a list of strings.
+    Runs that stop on 'requires_action' are cancelled and raise a RuntimeError.
+    """
+    collector = _ReplyCollector()
+    with openai_client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        event_handler=collector,
+        timeout=timeout,
+    ) as stream:
+        stream.until_done()
+        final_run = stream.get_final_run()
+
+    _settle_run(thread_id, final_run, timeout, poll_interval, max_interval, jitter)
+    return collector.replies
+
+def _settle_run(
+    thread_id: str,
+    run,
+    timeout: float,
+    poll_interval: float,
+    max_interval: float,
+    jitter: Literal["full", "equal", "none"],
+) -> None:
+    """
+    Raise unless a streamed run completed. Runs stopped on 'requires_action' are cancelled first.
+    """
+    if run.status == "requires_action":
+        # No tools are handled here, so the action would never be resolved. Cancel the run and
+        # wait for the cancel to land so the thread accepts new messages, then report it.
+        # The run reports requires_action until the cancel lands, so only terminal statuses end the wait.
+        cancelling = openai_client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+        if getattr(cancelling, "status", "") not in _TERMINAL_STATUSES:
+            _poll_run_until_done(
+                thread_id=thread_id,
+                run_id=run.id,
+                timeout=timeout,
+                poll_interval=poll_interval,
+                max_interval=max_interval,
+                jitter=jitter,
+                until=_TERMINAL_STATUSES,
+            )
+
+    _check_run_completed(run)
+
+def _stream_run_text(
+    thread_id: str,
+    assistant_id: str,
+    timeout: float = 120.0,
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
+) -> Iterator[Any]:
+    """
+    Stream a run of the assistant on the thread, yielding reply text as it arrives.
+    MESSAGE_BREAK is yielded between separate assistant messages.
+    """
+    with openai_client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        timeout=timeout,
+    ) as stream:
+        yielded = False
+        separate = False
+        for event in stream:
+            if event.event == "thread.message.created":
+                separate = yielded
+            elif event.event == "thread.message.delta":
+                for part in event.data.delta.content or []:
+                    value = _part_text(part) if getattr(part, "type", None) == "text" else ""
+                    if not value:
+                        continue
+                    if separate:
+                        yield MESSAGE_BREAK
+                        separate = False
+                    yield value
+                    yielded = True
+        final_run = stream.get_final_run()
+
+    _settle_run(thread_id, final_run, timeout, poll_interval, max_interval, jitter)
 
 # -------- Public API -------- #
 
@@ -83,34 +293,73 @@ def get_history(thread_id: str) -> List[Dict[str, str]]:
     Retrieve the conversation history for a thread as a list of {role, content} in chronological order.
     """
     try:
-        resp = openai_client.beta.threads.messages.list(thread_id=thread_id)
-        # API returns reverse-chronological; we normalize to chronological (oldest -> newest)
-        items = list(resp.data)[::-1]
+        with _history_lock:
+            cached = _history_cache.get(thread_id)
+            if cached is not None:
+                _history_cache.move_to_end(thread_id)
+        if cached is not None:
+            # Cheap probe: if the newest message is unchanged, so is the rendered history
+            newest = openai_client.beta.threads.messages.list(thread_id=thread_id, limit=1, order="desc")
+            newest_id = newest.data[0].id if newest.data else ""
+            if cached[0] == newest_id:
+                return list(cached[1])
+
+        # Ask for chronological order (oldest -> newest); iterating the page auto-paginates
+        items = openai_client.beta.threads.messages.list(thread_id=thread_id, order="asc", limit=100)
 
         history: List[Dict[str, str]] = []
+        newest_id = ""
         for msg in items:
+            newest_id = msg.id
             role = getattr(msg, "role", "assistant")
             text = _extract_text_parts(msg)
             # If no text content (e.g., only attachments), still include an empty string to preserve order.
 
-            # Product links mapping
-            product_links = {
-                "EcoStatic": " - https://bioreactguatemala.com/product/ecostatic-urbano/",
-                "EcoBotanik": " - https://bioreactguatemala.com/product/ecobotanik-1l/",
-                "FungiPlus": " - https://bioreactguatemala.com/product/fungiplus-urbano/",
-                "ParaFungi": " - https://bioreactguatemala.com/product/parafungi-1l/",
-                "DiatoMaster": " - https://bioreactguatemala.com/product/tierra-de-diatomeas-diatomaster-media-libra/"
-            }
-            # Append product link if mentioned in text
-            for product, link in product_links.items():
-                if product in text:
-                    text += link    
+            # Append product link if mentioned in text (in _PRODUCT_LINKS order)
+            found = set(_PRODUCT_RE.findall(text))
+            if found:
+                text += "".join(link for product, link in _PRODUCT_LINKS.items() if product in found)
             
             history.append({"role": role, "content": text})
-        return history
+
+        with _history_lock:
+            _history_cache[thread_id] = (newest_id, history)
+            _history_cache.move_to_end(thread_id)
+            while len(_history_cache) > _HISTORY_CACHE_SIZE:
+                _history_cache.popitem(last=False)
+        return list(history)
     except Exception as e:
-        print(f"Error getting history: {e}")
-        return []
+        # Raise rather than return [], which callers can't tell apart from an empty thread
+        raise RuntimeError(f"Failed to get history: {e}")
+
+def summarize(history: List[Dict[str, str]], timeout: float = 120.0) -> str:
+    """
+    Condense a list of {role, content} messages into a short recap. Returns "" if it can't.
+    """
+    if not history:
+        return ""
+
+    transcript = "\n".join(f"{item.get('role', 'assistant')}: {item.get('content', '')}" for item in history)
+    try:
+        resp = openai_client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            timeout=timeout,  # Long transcripts can outlast the client's default request timeout
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Summarize this conversation between a user and Nick, a plant care assistant, "
+                        "in a few sentences. Keep plant symptoms, diagnoses and recommended products. "
+                        "Write the summary in the language of the conversation."
+                    ),
+                },
+                {"role": "user", "content": transcript},
+            ],
+        )
+        return (resp.choices[0].message.content or "").strip()
+    except Exception as e:
+        print(f"Error summarizing history: {e}")
+        return ""
 
 def send_message(
     thread_id: str,
@@ -118,7 +367,9 @@ def send_message(
     *,
     assistant_id: Optional[str] = None,
     timeout: float = 120.0,
-    poll_interval: float = 1.0
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
 ) -> List[str]:
     """
     Send a user message to the given thread, run the assistant, and return the assistant's new replies as a list of strings.
@@ -133,53 +384,142 @@ def send_message(
             content=message
         )
 
-        # 2) Create a run for the assistant on this thread
-        run = openai_client.beta.threads.runs.create(
+        # 2) Run the assistant and collect its replies as they stream in
+        return _run_assistant(
             thread_id=thread_id,
-            assistant_id=aid
+            assistant_id=aid,
+            timeout=timeout,
+            poll_interval=poll_interval,
+            max_interval=max_interval,
+            jitter=jitter,
         )
+        
+    except Exception as e:
+        raise RuntimeError(f"Failed to send message: {e}")
 
-        # 3) Wait until the run finishes
-        final_run = _poll_run_until_done(
-            thread_id=thread_id, 
-            run_id=run.id, 
-            timeout=timeout, 
-            poll_interval=poll_interval
+def send_message_stream(
+    thread_id: str,
+    message: str,
+    *,
+    assistant_id: Optional[str] = None,
+    timeout: float = 120.0,
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
+) -> Iterator[Any]:
+    """
+    Like send_message, but yields the assistant's reply text as it is generated,
+    with MESSAGE_BREAK between separate assistant messages.
+    """
+    aid = assistant_id or ASSISTANT_ID
+
+    try:
+        openai_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=message
+        )
+
+        yield from _stream_run_text(
+            thread_id=thread_id,
+            assistant_id=aid,
+            timeout=timeout,
+            poll_interval=poll_interval,
+            max_interval=max_interval,
+            jitter=jitter,
         )
 
-        if final_run.status != "completed":
-            # Basic error surface; you can expand with more detail if needed
-            error_msg = f"Run ended with status: {final_run.status}"
-            if hasattr(final_run, 'last_error') and final_run.last_error:
-                error_msg += f" - Error: {final_run.last_error}"
-            raise RuntimeError(error_msg)
-
-        # 4) Fetch latest messages and return ONLY the assistant messages created after this run started
-        messages = openai_client.beta.threads.messages.list(thread_id=thread_id)
-
-        assistant_texts: List[str] = []
-        for msg in messages.data:
-            if getattr(msg, "role", "") == "assistant":
-                text = _extract_text_parts(msg)
-                if text:
-                    assistant_texts.append(text)
-            else:
-                # Stop when we hit the user message(s) again in reverse order
-                break
-
-        # messages.data is reverse-chronological; we collected newest-first, so reverse to oldest-first for readability
-        return list(reversed(assistant_texts))
-        
     except Exception as e:
         raise RuntimeError(f"Failed to send message: {e}")
 
+def _post_image_message(thread_id: str, text: str, upload: Any, timeout: float) -> str:
+    """
+    Upload an image (anything files.create accepts as `file`) and add it, with optional text,
+    to the thread as a user message. Returns the uploaded file's ID.
+    """
+    # 1) Upload image file
+    file_obj = openai_client.files.create(
+        file=upload,
+        purpose="vision",  # Changed from "assistants" to "vision" for image files
+        timeout=timeout,  # Uploads can outlast the client's default request timeout
+    )
+
+    # 2) Create message content array
+    message_content = []
+    
+    # Add text if provided
+    if text and text.strip():
+        message_content.append({
+            "type": "text",  # Fixed: was "input_text", should be "text"
+            "text": text
+        })
+    
+    # Add image
+    message_content.append({
+        "type": "image_file",  # Fixed: was "input_image", should be "image_file"
+        "image_file": {  # Fixed: was "image_url", should be "image_file"
+            "file_id": file_obj.id
+        }
+    })
+
+    # 3) Create the message
+    try:
+        openai_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=message_content,
+        )
+    except Exception:
+        _cleanup_executor.submit(delete_file, file_obj.id)
+        raise
+
+    # Later runs read the whole thread, image included, so the file stays until retire_thread
+    return file_obj.id
+
+def _bytes_upload(data: bytes, filename: str) -> Tuple[str, bytes, str]:
+    """
+    Validate in-memory image bytes and return them as a files.create upload tuple.
+    """
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"File too large: {len(data)} bytes (max 20MB)")
+
+    mime_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return (filename, data, mime_type)
+
+def _send_image_upload(
+    thread_id: str,
+    text: str,
+    upload: Any,
+    assistant_id: str,
+    timeout: float,
+    poll_interval: float,
+    max_interval: float,
+    jitter: Literal["full", "equal", "none"],
+) -> List[str]:
+    """
+    Send an image with optional text to the thread, run the assistant, and return the assistant's replies.
+    """
+    _post_image_message(thread_id, text, upload, timeout)
+
+    # Run the assistant and collect its replies as they stream in
+    return _run_assistant(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        timeout=timeout,
+        poll_interval=poll_interval,
+        max_interval=max_interval,
+        jitter=jitter,
+    )
+
 def send_image_file(
     thread_id: str,
     text: str,
     file_path: str,
     assistant_id: Optional[str] = None,
     timeout: float = 120.0,
-    poll_interval: float = 1.0,
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
 ) -> List[str]:
     """
     Uploads an image file, sends it with optional text to the thread, runs the assistant,
@@ -194,77 +534,74 @@ def send_image_file(
         
         # Get file size for validation
         file_size = os.path.getsize(file_path)
-        if file_size > 20 * 1024 * 1024:  # 20MB limit
+        if file_size > MAX_IMAGE_BYTES:
             raise ValueError(f"File too large: {file_size} bytes (max 20MB)")
         
-        # 1) Upload image file
         with open(file_path, "rb") as f:
-            file_obj = openai_client.files.create(
-                file=f,
-                purpose="vision",  # Changed from "assistants" to "vision" for image files
-            )
-
-        # 2) Create message content array
-        message_content = []
+            return _send_image_upload(thread_id, text, f, aid, timeout, poll_interval, max_interval, jitter)
         
-        # Add text if provided
-        if text and text.strip():
-            message_content.append({
-                "type": "text",  # Fixed: was "input_text", should be "text"
-                "text": text
-            })
-        
-        # Add image
-        message_content.append({
-            "type": "image_file",  # Fixed: was "input_image", should be "image_file"
-            "image_file": {  # Fixed: was "image_url", should be "image_file"
-                "file_id": file_obj.id
-            }
-        })
+    except FileNotFoundError as e:
+        raise RuntimeError(f"File error: {e}")
+    except ValueError as e:
+        raise RuntimeError(f"Validation error: {e}")
+    except Exception as e:
+        raise RuntimeError(f"Failed to send image: {e}")
 
-        # 3) Create the message
-        openai_client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=message_content,
-        )
+def send_image_bytes(
+    thread_id: str,
+    text: str,
+    data: bytes,
+    filename: str,
+    assistant_id: Optional[str] = None,
+    timeout: float = 120.0,
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
+) -> List[str]:
+    """
+    Like send_image_file, but uploads in-memory image bytes directly instead of reading a path.
+    """
+    aid = assistant_id or ASSISTANT_ID
 
-        # 4) Run the assistant
-        run = openai_client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=aid,
+    try:
+        return _send_image_upload(
+            thread_id, text, _bytes_upload(data, filename), aid, timeout, poll_interval, max_interval, jitter
         )
 
-        # 5) Poll until completion
-        final_run = _poll_run_until_done(
+    except ValueError as e:
+        raise RuntimeError(f"Validation error: {e}")
+    except Exception as e:
+        raise RuntimeError(f"Failed to send image: {e}")
+
+def send_image_bytes_stream(
+    thread_id: str,
+    text: str,
+    data: bytes,
+    filename: str,
+    assistant_id: Optional[str] = None,
+    timeout: float = 120.0,
+    poll_interval: float = 0.25,
+    max_interval: float = 8.0,
+    jitter: Literal["full", "equal", "none"] = "full",
+) -> Iterator[Any]:
+    """
+    Like send_image_bytes, but yields the assistant's reply text as it is generated,
+    with MESSAGE_BREAK between separate assistant messages.
+    """
+    aid = assistant_id or ASSISTANT_ID
+
+    try:
+        _post_image_message(thread_id, text, _bytes_upload(data, filename), timeout)
+
+        yield from _stream_run_text(
             thread_id=thread_id,
-            run_id=run.id,
+            assistant_id=aid,
             timeout=timeout,
             poll_interval=poll_interval,
+            max_interval=max_interval,
+            jitter=jitter,
         )
 
-        if final_run.status != "completed":
-            error_msg = f"Run ended with status: {final_run.status}"
-            if hasattr(final_run, 'last_error') and final_run.last_error:
-                error_msg += f" - Error: {final_run.last_error}"
-            raise RuntimeError(error_msg)
-
-        # 6) Read most recent assistant messages (newest-first) and collect text
-        messages = openai_client.beta.threads.messages.list(thread_id=thread_id)
-
-        assistant_texts: List[str] = []
-        for msg in messages.data:
-            if getattr(msg, "role", "") == "assistant":
-                text = _extract_text_parts(msg)
-                if text:
-                    assistant_texts.append(text)
-            else:
-                break
-
-        return list(reversed(assistant_texts))
-        
-    except FileNotFoundError as e:
-        raise RuntimeError(f"File error: {e}")
     except ValueError as e:
         raise RuntimeError(f"Validation error: {e}")
     except Exception as e:
@@ -281,6 +618,26 @@ def delete_file(file_id: str) -> bool:
         print(f"Failed to delete file {file_id}: {e}")
         return False
 
+def _delete_thread_files(thread_id: str) -> None:
+    """
+    Delete every image file referenced by the thread's messages.
+    """
+    try:
+        for msg in openai_client.beta.threads.messages.list(thread_id=thread_id, order="asc", limit=100):
+            for part in getattr(msg, "content", []) or []:
+                if getattr(part, "type", None) == "image_file":
+                    delete_file(part.image_file.file_id)
+    except Exception as e:
+        print(f"Failed to clean up files of thread {thread_id}: {e}")
+
+def retire_thread(thread_id: str) -> None:
+    """
+    Delete, in the background, the image files uploaded to a thread that is no longer used.
+    The file IDs are read back from the thread itself, so this also works for threads of
+    sessions that ended without retiring them (see pagestore.sweep).
+    """
+    _cleanup_executor.submit(_delete_thread_files, thread_id)
+
 def list_thread_messages(thread_id: str, limit: int = 20) -> List[Dict]:
     """
     List messages in a thread with more detailed information.
@@ -2,107 +2,387 @@
 import streamlit as st
 # from st_keyup import st_keyup
  
-from datetime import datetime
 from typing import Dict, List
-import tempfile
 import os
-from PIL import Image
-import io
 import random
+import time
 from pathlib import Path
-from agent import create_thread, get_history, send_message, send_image_file
+import pagestore
+from agent import (
+    MESSAGE_BREAK,
+    create_thread,
+    get_history,
+    retire_thread,
+    summarize,
+    send_image_bytes_stream,
+    send_image_file,
+    send_message_stream,
+)
 
 # Get the directory of your current script
 current_dir = Path(__file__).parent
 image_path = current_dir / "Nick imagen.png"
+
+# ---------- Constants ----------
+# Images are re-encoded before upload unless already this small; the vision model downsamples past 2048px anyway
+_MAX_IMAGE_DIM = 2048
+_PASSTHROUGH_IMAGE_BYTES = 1024 * 1024
+_JPEG_QUALITY = 85
+
+# Bounding box for the chat thumbnails of uploaded images
+_THUMB_SIZE = (300, 300)
+
+# Set FORCE_DISK_UPLOAD to send images through a temp file path instead of straight from memory
+_FORCE_DISK_UPLOAD = os.getenv("FORCE_DISK_UPLOAD", "").strip().lower() in {"1", "true", "yes", "on"}
+
+# Restored threads keep this many messages verbatim; older ones are folded into one summary
+_MAX_RECENT = 40
+
+# Messages rendered per page of chat history; older pages load on demand
+_PAGE_SIZE = 30
+
+_GREETINGS = (
+    "Hi, I'm Nick! Are you having trouble with your plants?",
+    "Hi, my name is Nick! Are pests affecting your garden, vegetable garden, or crops?",
+    "Hi, I'm Nick! I'll help you diagnose diseases in your plants.",
+    "Hi, my name is Nick! I'll help you get rid of the insects on your plants.",
+    "Hi, my name is Nick! Find out which pest is affecting your plants."
+)
+
+_INFO_OPTIONS = (
+    "Hi, I'm Nick! Let's start diagnosing your plants. Describe what problems you see and what changes you've noticed. Write in any language or attach a photo of your plant to get started.",
+    "Hi, I'm Nick! Not sure what's happening to your plants? I'll help you treat pests and diseases. Write in any language or attach a photo of your plant to get started.",
+    "Hi, I'm Nick! If your plant is being affected by insects, fungi, or slugs, I'll help you treat it. Write in any language or attach a photo of your plant to get started.",
+    "Hi, I'm Nick! If your plant is being affected by insects, fungi, or slugs, I'll help you treat it. Write in any language or attach a photo of your plant to get started.",
+    "Hi, I'm Nick! If your plant is sick and you don't know how to treat it, I'll help you. Describe its symptoms. Write in any language or attach a photo of your plant to get started."
+)
+
+_BUTTON_CSS = """
+<style>
+.stButton > button {
+    background-color: #4CAF50;
+    color: white;
+    font-weight: bold;
+    border: none;
+    padding: 10px 24px;
+    border-radius: 4px;
+    font-size: 20px;
+}
+.stButton > button:hover {
+    background-color: #45a049;
+}
+</style>
+"""
+
 # ---------- Page config ----------
 st.set_page_config(page_title="NickAI", page_icon="🌱", layout="wide")
 
+def _hms() -> str:
+    """Current local time as HH:MM:SS, without strftime's format parsing"""
+    t = time.localtime()
+    return f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+
+def history_fingerprint(history: List[Dict[str, str]]) -> int:
+    """Cheap change check for a thread's history, compared before rebuilding the chat from it"""
+    return hash(tuple((item.get("role", ""), item.get("content", "")) for item in history))
+
+def sender_of(role: str) -> str:
+    """Map an API message role to this app's sender"""
+    return "user" if role == "user" else "assistant"
+
+def renderer_key(sender: str, message_type: str) -> str:
+    """Pick the display_message renderer for a message once, when it is created"""
+    if sender == "user":
+        return "user_image" if message_type == "image" else "user_text"
+    return "summary" if message_type == "summary" else "assistant"
+
+def condense_history(history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Keep the newest _MAX_RECENT turns verbatim and fold older ones into a single summary message"""
+    if len(history) <= _MAX_RECENT:
+        return history
+    summary = summarize(history[:-_MAX_RECENT])
+    recent = history[-_MAX_RECENT:]
+    if summary:
+        recent.insert(0, {"role": "assistant", "content": summary, "type": "summary"})
+    return recent
+
+def restore_messages(history: List[Dict[str, str]]):
+    """Replace the session's chat with a thread history, condensed, spilled to disk and windowed into memory"""
+    # Restored messages have no real send time, so the whole batch shares one timestamp
+    ts = _hms()
+    caption = f"🕐 {ts}"
+    rows = [
+        (sender_of(item.get("role")), item.get("type", "text"), item.get("content", ""))
+        for item in condense_history(history)
+    ]
+    messages = [
+        {
+            "id": i + 1,
+            "content": content,
+            "type": message_type,
+            "sender": sender,
+            "timestamp": ts,
+            "_rendered_caption": caption,
+            "_render": renderer_key(sender, message_type),
+            "image": None,
+        }
+        for i, (sender, message_type, content) in enumerate(rows)
+    ]
+    # Spill the restored history to disk and keep only its newest page (and first screenful) in memory
+    pagestore.replace(st.session_state.thread_id, messages)
+    active_start = pagestore.page_of(len(messages)) * pagestore.PAGE_SIZE if messages else 0
+    st.session_state.messages = messages[max(0, min(active_start, len(messages) - _PAGE_SIZE)):]
+    st.session_state.message_id = len(messages)
+
 # ---------- Session state bootstrapping ----------
-if "thread_id" not in st.session_state:
+# A thread created in this run has no history yet, so bootstrap doesn't fetch it
+new_thread = "thread_id" not in st.session_state
+if new_thread:
     # Use existing thread if you have one; else create a new one
     st.session_state.thread_id = create_thread()
+    # Each new session starts a thread, so drop what abandoned sessions left behind:
+    # their pages here and the image files uploaded to their threads
+    pagestore.sweep(on_expire=retire_thread)
 
 if "messages" not in st.session_state:
     # Normalize history into this app's structure
-    history = get_history(st.session_state.thread_id)  # [{role, content}]
-    st.session_state.messages: List[Dict] = []  
-    for item in history:
-        st.session_state.messages.append(
-            {
-                "id": len(st.session_state.messages) + 1,
-                "content": item.get("content", ""),
-                "type": "text",
-                "sender": "user" if item.get("role") == "user" else "assistant",
-                "timestamp": datetime.now().strftime("%H:%M:%S"),
-                "image": None,
-            }
-        )
-
-if "message_id" not in st.session_state:
-    st.session_state.message_id = len(st.session_state.messages)
+    try:
+        history = [] if new_thread else get_history(st.session_state.thread_id)  # [{role, content}]
+        st.session_state.history_hash = history_fingerprint(history)
+    except RuntimeError as e:
+        # Start empty; with no stored fingerprint, "Load history" rebuilds the chat once the API is back
+        st.error(f"Error al cargar historial: {e}")
+        history = []
+    restore_messages(history)
 
 if "pending_upload" not in st.session_state:
     st.session_state.pending_upload = None
 
+# How many messages beyond the first page of history are currently shown
+st.session_state.setdefault("history_offset", 0)
+
 # ---------- Helpers ----------
+@st.cache_resource(show_spinner=False)
+def load_splash_image():
+    """Decode the welcome-screen image once per process and share it across sessions"""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        return img.copy()
+
+def make_thumbnail(data: bytes):
+    """Shrink an uploaded image to a 300px PNG thumbnail for the chat; None if it can't be decoded"""
+    import io
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as src:
+            # Apply the EXIF orientation first so phone photos aren't shown on their side
+            img = ImageOps.exif_transpose(src)
+            img.thumbnail(_THUMB_SIZE)
+            buf = io.BytesIO()
+            img.save(buf, format="PNG")
+        return buf.getvalue()
+    except Exception:
+        return None
+
 def add_message(content: str, message_type: str = "text", sender: str = "user", image=None):
     st.session_state.message_id += 1
-    st.session_state.messages.append(
+    timestamp = _hms()
+    thumb = make_thumbnail(image.getvalue()) if hasattr(image, "getvalue") else None
+    msg = {
+        "id": st.session_state.message_id,
+        "content": content,
+        "type": message_type,
+        "sender": sender,
+        "timestamp": timestamp,
+        # Caption text is fixed once the message exists, so build it once instead of per rerun
+        "_rendered_caption": f"🕐 {timestamp}",
+        "_render": renderer_key(sender, message_type),
+        # Keep the (up to 20MB) upload itself only when there's no thumbnail to show instead
+        "image": None if thumb else image,
+        "image_thumb": thumb,
+    }
+    pagestore.append(st.session_state.thread_id, msg)
+    _keep_active_page([msg])
+
+def extend_messages(contents: List[str], sender: str = "assistant"):
+    """Add several text messages at once, sharing one timestamp and one pagestore write"""
+    if not contents:
+        return
+    timestamp = _hms()
+    caption = f"🕐 {timestamp}"
+    start = st.session_state.message_id
+    msgs = [
         {
-            "id": st.session_state.message_id,
+            "id": start + i + 1,
             "content": content,
-            "type": message_type,
+            "type": "text",
             "sender": sender,
-            "timestamp": datetime.now().strftime("%H:%M:%S"),
-            "image": image,
+            "timestamp": timestamp,
+            "_rendered_caption": caption,
+            "_render": renderer_key(sender, "text"),
+            "image": None,
+            "image_thumb": None,
         }
-    )
+        for i, content in enumerate(contents)
+    ]
+    st.session_state.message_id = start + len(msgs)
+    pagestore.extend(st.session_state.thread_id, msgs)
+    _keep_active_page(msgs)
+
+def _window_size() -> int:
+    """Number of newest messages currently shown in the chat"""
+    return _PAGE_SIZE + st.session_state.history_offset
+
+def _keep_active_page(new_msgs: List[Dict]):
+    """Add new messages to memory, dropping those outside both the active page and the shown window (they're on disk)"""
+    messages = st.session_state.messages + new_msgs
+    newest_id = messages[-1]["id"]
+    keep_from = min(pagestore.page_of(newest_id) * pagestore.PAGE_SIZE + 1, newest_id - _window_size() + 1)
+    if messages[0]["id"] < keep_from:
+        messages = [m for m in messages if m["id"] >= keep_from]
+    st.session_state.messages = messages
+
+def recent_messages(count: int) -> List[Dict]:
+    """Return the newest `count` messages, reading older pages back from the pagestore once as needed"""
+    active = st.session_state.messages
+    if count <= len(active) or not active:
+        return active[-count:]
+
+    first_id = max(1, st.session_state.message_id - count + 1)
+    oldest_id = active[0]["id"]
+    older: List[Dict] = []
+    for page_id in range(pagestore.page_of(first_id), pagestore.page_of(oldest_id) + 1):
+        page = pagestore.load_page(st.session_state.thread_id, page_id)
+        older.extend(m for m in page if first_id <= m["id"] < oldest_id)
+    # Keep what was read in memory so later reruns don't decode the same pages again
+    st.session_state.messages = older + active
+    return st.session_state.messages[-count:]
+
+def _render_user_image(message: Dict):
+    with st.chat_message("user"):
+        # Display the image
+        try:
+            if message.get("image_thumb"):
+                # Thumbnail encoded once in add_message; no PIL work per rerun
+                st.image(message["image_thumb"], caption="Imagen enviada", width=300)
+            elif message.get("image") is not None:
+                # File path, URL or uploaded file object; st.image reads them without a PIL decode
+                st.image(message["image"], caption="Imagen enviada", width=300)
+        except Exception as e:
+            st.error(f"Error displaying image: {e}")
+            
+        # Display any accompanying text
+        if message["content"] and message["content"] != "(Imagen adjunta)":
+            st.write(message["content"])
+        st.caption(message["_rendered_caption"])
 
-def display_message(message: Dict):
-    if message["sender"] == "user":
-        with st.chat_message("user"):
-            if message["type"] == "image" and message["image"] is not None:
-                # Display the image
-                try:
-                    if isinstance(message["image"], str):
-                        # If it's a file path or base64 string
-                        st.image(message["image"], caption="Imagen enviada", width=300)
-                    else:
-                        # If it's an uploaded file object
-                        image = Image.open(message["image"])
-                        st.image(image, caption="Imagen enviada", width=300)
-                except Exception as e:
-                    st.error(f"Error displaying image: {e}")
-                    
-                # Display any accompanying text
-                if message["content"] and message["content"] != "(Imagen adjunta)":
-                    st.write(message["content"])
-            elif message["type"] == "text":
-                st.write(message["content"])
-                
-            st.caption(f"🕐 {message['timestamp']}")
-    else:
-        with st.chat_message("assistant", avatar="🌱"):
+def _render_user_text(message: Dict):
+    with st.chat_message("user"):
+        st.write(message["content"])
+        st.caption(message["_rendered_caption"])
+
+def _render_assistant(message: Dict):
+    with st.chat_message("assistant", avatar="🌱"):
+        st.write(message["content"])
+        st.caption(message["_rendered_caption"])
+
+def _render_summary(message: Dict):
+    with st.chat_message("assistant", avatar="🌱"):
+        with st.expander("Earlier conversation summary"):
             st.write(message["content"])
-            st.caption(f"🕐 {message['timestamp']}")
+        st.caption(message["_rendered_caption"])
+
+# Renderer per message kind; messages carry their kind in "_render" (see renderer_key)
+_RENDERERS = {
+    "user_image": _render_user_image,
+    "user_text": _render_user_text,
+    "assistant": _render_assistant,
+    "summary": _render_summary,
+}
+
+def display_message(message: Dict):
+    key = message.get("_render") or renderer_key(message["sender"], message["type"])
+    _RENDERERS[key](message)
+
+def prepare_image_upload(data: bytes, filename: str):
+    """Downscale and re-encode large images as JPEG before upload; returns (data, filename)"""
+    # Imported here so text-only sessions never pay for PIL
+    import io
+    from PIL import Image, ImageOps
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        if len(data) <= _PASSTHROUGH_IMAGE_BYTES and max(img.size) <= _MAX_IMAGE_DIM:
+            return data, filename
+
+        # The re-encoded JPEG carries no EXIF, so bake the orientation into the pixels
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((_MAX_IMAGE_DIM, _MAX_IMAGE_DIM), Image.LANCZOS)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=_JPEG_QUALITY, optimize=True)
+    except Exception:
+        # Formats PIL can't decode go up as-is
+        return data, filename
+
+    # Keep the original if re-encoding didn't actually help
+    if buf.tell() >= len(data):
+        return data, filename
+    return buf.getvalue(), os.path.splitext(filename)[0] + ".jpg"
+
+def send_image_via_disk(text: str, data: bytes, filename: str):
+    """Send an image via a temporary file on disk (only used with FORCE_DISK_UPLOAD)"""
+    import tempfile
+
+    # The file is removed automatically when the block exits; flush so the upload reads every byte
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(filename)[1]) as tmp_file:
+        tmp_file.write(data)
+        tmp_file.flush()
+        return send_image_file(
+            thread_id=st.session_state.thread_id,
+            text=text,
+            file_path=tmp_file.name,
+        )
 
-def process_image_and_text(uploaded_file, text_input):
+def stream_reply(container, chunks) -> List[str]:
+    """Redraw the chat in `container` and write the assistant's replies under it as they stream in, one bubble per message"""
+    chunks = iter(chunks)
+    replies: List[str] = []
+    more = True
+
+    def message_chunks():
+        # Text of the current assistant message; stops at MESSAGE_BREAK and flags that another follows
+        nonlocal more
+        more = False
+        for chunk in chunks:
+            if chunk is MESSAGE_BREAK:
+                more = True
+                return
+            yield chunk
+
+    with container.container():
+        for message in recent_messages(_window_size()):
+            display_message(message)
+        while more:
+            with st.chat_message("assistant", avatar="🌱"):
+                reply = st.write_stream(message_chunks())
+            text = (reply if isinstance(reply, str) else "".join(map(str, reply))).strip()
+            if text:
+                replies.append(text)
+    return replies
+
+def process_image_and_text(uploaded_file, text_input, container):
     """Process image upload and text together"""
     responses = []
     
-    # Create a temporary file for the image
     if uploaded_file is not None:
-        # Get file extension
-        file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-        if not file_extension:
-            file_extension = ".png"
-            
-        # Create temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-            # Write uploaded file content to temp file
-            tmp_file.write(uploaded_file.getbuffer())
-            tmp_path = tmp_file.name
+        # Make sure the upload name carries an extension so its MIME type can be inferred
+        filename = uploaded_file.name
+        if not os.path.splitext(filename)[1]:
+            filename += ".png"
         
         try:
             # Add user message with image
@@ -113,34 +393,31 @@ def process_image_and_text(uploaded_file, text_input):
                 image=uploaded_file
             )
             
-            # Send to assistant
-            replies = send_image_file(
-                thread_id=st.session_state.thread_id,
-                text=text_input if text_input else "Por favor analiza esta imagen.",
-                file_path=tmp_path,
-                assistant_id=os.getenv("ASSISTANT_ID"),
-            )
+            # Shrink large images, then send to assistant straight from memory
+            data, filename = prepare_image_upload(uploaded_file.getvalue(), filename)
+            prompt = text_input if text_input else "Por favor analiza esta imagen."
+            if _FORCE_DISK_UPLOAD:
+                replies = send_image_via_disk(prompt, data, filename)
+            else:
+                replies = stream_reply(container, send_image_bytes_stream(
+                    thread_id=st.session_state.thread_id,
+                    text=prompt,
+                    data=data,
+                    filename=filename,
+                ))
             
             # Add assistant responses
-            for reply in replies:
-                add_message(reply, "text", "assistant")
-                responses.append(reply)
+            extend_messages(replies)
+            responses.extend(replies)
                 
         except Exception as e:
             error_msg = f"⚠️ Error al procesar la imagen: {str(e)}"
             add_message(error_msg, "text", "assistant")
             responses.append(error_msg)
-        finally:
-            # Clean up temp file
-            try:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-            except Exception:
-                pass
     
     return responses
 
-def process_text_only(text_input):
+def process_text_only(text_input, container):
     """Process text-only message"""
     responses = []
     
@@ -148,16 +425,15 @@ def process_text_only(text_input):
         # Add user message
         add_message(text_input, "text", "user")
         
-        # Send to assistant
-        replies = send_message(
+        # Send to assistant, showing the reply in the chat as it is generated
+        replies = stream_reply(container, send_message_stream(
             thread_id=st.session_state.thread_id,
             message=text_input,
-        )
+        ))
         
         # Add assistant responses
-        for reply in replies:
-            add_message(reply, "text", "assistant")
-            responses.append(reply)
+        extend_messages(replies)
+        responses.extend(replies)
             
     except Exception as e:
         error_msg = f"⚠️ Error al procesar el mensaje: {str(e)}"
@@ -184,44 +460,24 @@ if not st.session_state.started:
         ic1, ic2, ic3 = st.columns([1, 8, 1])
         with ic2:
             try:
-                img = Image.open(image_path)  # ensure the file is in your app's working dir
+                img = load_splash_image()  # ensure the file is in your app's working dir
                 st.image(img, use_container_width=True)
             except FileNotFoundError:
                 st.info("Image not found")
 
-        greetings = [
-            "Hi, I'm Nick! Are you having trouble with your plants?",
-            "Hi, my name is Nick! Are pests affecting your garden, vegetable garden, or crops?",
-            "Hi, I'm Nick! I'll help you diagnose diseases in your plants.",
-            "Hi, my name is Nick! I'll help you get rid of the insects on your plants.",
-            "Hi, my name is Nick! Find out which pest is affecting your plants."
-        ]
-
+        # Pick the greeting once per session so it doesn't change on every rerun
+        if "greeting" not in st.session_state:
+            st.session_state.greeting = random.choice(_GREETINGS)
 
         st.markdown(
-            f"<h2 style='text-align:center;'>{random.choice(greetings)}</h2>",
+            f"<h2 style='text-align:center;'>{st.session_state.greeting}</h2>",
             unsafe_allow_html=True
         )
 
         # center the button in the middle column too
         bcol1, bcol2, bcol3 = st.columns([1, 2, 1])
         with bcol2:
-            st.markdown("""
-            <style>
-            .stButton > button {
-                background-color: #4CAF50;
-                color: white;
-                font-weight: bold;
-                border: none;
-                padding: 10px 24px;
-                border-radius: 4px;
-                font-size: 20px;
-            }
-            .stButton > button:hover {
-                background-color: #45a049;
-            }
-            </style>
-            """, unsafe_allow_html=True)
+            st.markdown(_BUTTON_CSS, unsafe_allow_html=True)
             st.button(
                 "Start",
                 use_container_width=True,
@@ -231,8 +487,8 @@ else:
     st.title("🌱 Nick")
     st.markdown("---")
 
-    # Chat container for messages
-    chat_container = st.container()
+    # Chat placeholder for messages; its contents are swapped in one go on each rerun
+    chat_container = st.empty()
 
     # Input section
     st.markdown("---")
@@ -272,11 +528,15 @@ else:
             with st.spinner("Processing..."):
                 if has_image:
                     # Process image with optional text
-                    process_image_and_text(uploaded_file, user_input.strip() if has_text else "")
+                    process_image_and_text(uploaded_file, user_input.strip() if has_text else "", chat_container)
                 elif has_text:
                     # Process text only
-                    process_text_only(user_input.strip())
+                    process_text_only(user_input.strip(), chat_container)
             
+            # The chat now has local messages (maybe an error the thread never saw), so the next
+            # "Load history" must rebuild from the thread instead of reporting it unchanged
+            st.session_state.pop("history_hash", None)
+
             # Clear inputs by incrementing the key (creates new widgets)
             st.session_state.input_key += 1
             st.rerun()
@@ -284,23 +544,28 @@ else:
             st.warning("Por favor escribe un mensaje o sube una imagen.")
 
     # ---------- Display messages ----------
-    with chat_container:
+    with chat_container.container():
         if st.session_state.messages:
-            for message in st.session_state.messages:
+            # Render a window of the most recent messages; "Load older" widens it a page at a time
+            window_size = _window_size()
+            messages = recent_messages(window_size)
+            if st.session_state.message_id > window_size:
+                st.button(
+                    f"Load older ({st.session_state.message_id - window_size} more)",
+                    on_click=lambda: st.session_state.update(
+                        history_offset=st.session_state.history_offset + _PAGE_SIZE
+                    )
+                )
+            for message in messages:
                 display_message(message)
         else:
             
-            info_options = [
-                "Hi, I'm Nick! Let's start diagnosing your plants. Describe what problems you see and what changes you've noticed. Write in any language or attach a photo of your plant to get started.",
-                "Hi, I'm Nick! Not sure what's happening to your plants? I'll help you treat pests and diseases. Write in any language or attach a photo of your plant to get started.",
-                "Hi, I'm Nick! If your plant is being affected by insects, fungi, or slugs, I'll help you treat it. Write in any language or attach a photo of your plant to get started.",
-                "Hi, I'm Nick! If your plant is being affected by insects, fungi, or slugs, I'll help you treat it. Write in any language or attach a photo of your plant to get started.",
-                "Hi, I'm Nick! If your plant is sick and you don't know how to treat it, I'll help you. Describe its symptoms. Write in any language or attach a photo of your plant to get started."
-            ]
-            
+            # Pick the intro once per session so it doesn't change on every keystroke
+            if "info_msg" not in st.session_state:
+                st.session_state.info_msg = random.choice(_INFO_OPTIONS)
 
             st.info(
-                random.choice(info_options)
+                st.session_state.info_msg
             )
 
     # ---------- Sidebar ----------
@@ -309,23 +574,27 @@ else:
 
         if st.button("🔁 Load history", use_container_width=True):
             try:
-                st.session_state.messages = []
-                st.session_state.message_id = 0
                 history = get_history(st.session_state.thread_id)
-                for item in history:
-                    add_message(
-                        item.get("content", ""),
-                        "text",
-                        "user" if item.get("role") == "user" else "assistant",
-                    )
-                st.success("Historial recargado")
-                st.rerun()
+                fingerprint = history_fingerprint(history)
+                if fingerprint == st.session_state.get("history_hash"):
+                    # Nothing changed remotely since the last load; skip the rebuild and rerun
+                    st.toast("Already up to date")
+                else:
+                    st.session_state.history_offset = 0
+                    restore_messages(history)
+                    st.session_state.history_hash = fingerprint
+                    st.success("Historial recargado")
+                    st.rerun()
             except Exception as e:
                 st.error(f"Error al recargar historial: {e}")
 
         if st.button("🆕 New Conversation", use_container_width=True):
+            pagestore.clear(st.session_state.thread_id)
+            retire_thread(st.session_state.thread_id)
             st.session_state.thread_id = create_thread()
+            st.session_state.pop("history_hash", None)
             st.session_state.messages = []
             st.session_state.message_id = 0
+            st.session_state.history_offset = 0
             st.success("Nueva conversación iniciada")
             st.rerun() 
\ No newline at end of file
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Messages per page file; message ids start at 1, so page 0 holds ids 1..PAGE_SIZE
+PAGE_SIZE = 100
+
+# Where pages are written: {PAGES_DIR}/{thread_id}/{page_id}.jsonl
+PAGES_DIR = Path(os.getenv("PAGESTORE_DIR") or Path(tempfile.gettempdir()) / "botanick-pages")
+
+# Threads whose pages haven't been written for this long are removed by sweep()
+PAGE_TTL = 24 * 60 * 60  # 1 day
+
+# Marks bytes values encoded as base64 inside a page
+_BYTES_TAG = "__bytes__"
+
+# -------- Helpers -------- #
+
+def _thread_dir(thread_id: str) -> Path:
+    return PAGES_DIR / thread_id
+
+def _page_path(thread_id: str, page_id: int) -> Path:
+    return _thread_dir(thread_id) / f"{page_id}.jsonl"
+
+def _serializable(msg: Dict) -> Dict:
+    """
+    Keep only the JSON-friendly fields of a message (uploaded files and the like stay in memory).
+    Bytes (e.g. image thumbnails) are kept as tagged base64 strings.
+    """
+    out = {}
+    for k, v in msg.items():
+        if isinstance(v, bytes):
+            out[k] = {_BYTES_TAG: base64.b64encode(v).decode("ascii")}
+        elif isinstance(v, (str, int, float, bool)) or v is None:
+            out[k] = v
+    return out
+
+def _decode(obj: Dict):
+    if len(obj) == 1 and _BYTES_TAG in obj:
+        return base64.b64decode(obj[_BYTES_TAG])
+    return obj
+
+def _write_pages(thread_id: str, messages: Iterable[Dict], mode: str) -> None:
+    pages: Dict[int, List[str]] = {}
+    for msg in messages:
+        pages.setdefault(page_of(msg["id"]), []).append(json.dumps(_serializable(msg), ensure_ascii=False))
+    if not pages:
+        return
+
+    # Pages hold chat content, so keep them readable by this user only
+    PAGES_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    thread_dir = _thread_dir(thread_id)
+    thread_dir.mkdir(mode=0o700, exist_ok=True)
+    flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if mode == "a" else os.O_TRUNC)
+    for page_id, lines in pages.items():
+        fd = os.open(_page_path(thread_id, page_id), flags, 0o600)
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    # Appends don't touch the directory's mtime; sweep() reads it as the thread's last write
+    os.utime(thread_dir)
+
+# -------- Public API -------- #
+
+def page_of(message_id: int) -> int:
+    """
+    Return the page that holds the message with the given id.
+    """
+    return (message_id - 1) // PAGE_SIZE
+
+def append(thread_id: str, msg: Dict) -> None:
+    """
+    Append a message to the page its id belongs to.
+    """
+    extend(thread_id, [msg])
+
+def extend(thread_id: str, messages: Iterable[Dict]) -> None:
+    """
+    Append several messages, opening each page file once.
+    """
+    _write_pages(thread_id, messages, "a")
+
+def replace(thread_id: str, messages: Iterable[Dict]) -> None:
+    """
+    Drop every stored page for the thread and write the given messages in their place.
+    """
+    clear(thread_id)
+    _write_pages(thread_id, messages, "w")
+
+def load_page(thread_id: str, page_id: int) -> List[Dict]:
+    """
+    Load one page of messages, oldest-first. Missing pages load as empty.
+    """
+    try:
+        with _page_path(thread_id, page_id).open(encoding="utf-8") as f:
+            return [json.loads(line, object_hook=_decode) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def clear(thread_id: str) -> None:
+    """
+    Delete every stored page for the thread.
+    """
+    shutil.rmtree(_thread_dir(thread_id), ignore_errors=True)
+
+def sweep(max_age: float = PAGE_TTL, on_expire: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Delete the pages of every thread that hasn't been written to for max_age seconds,
+    calling on_expire with the ID of each thread removed.
+    """
+    cutoff = time.time() - max_age
+    try:
+        thread_dirs = list(PAGES_DIR.iterdir())
+    except FileNotFoundError:
+        return
+    for thread_dir in thread_dirs:
+        try:
+            if thread_dir.stat().st_mtime < cutoff:
+                shutil.rmtree(thread_dir, ignore_errors=True)
+                if on_expire is not None:
+                    on_expire(thread_dir.name)
+        except FileNotFoundError:
+            # Removed by another session's sweep
+            continue